@@ -0,0 +1,69 @@
+import os
+import atexit
+import threading
+from binance.client import Client
+from pymongo import MongoClient
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+# 환경 변수 로드
+load_dotenv()
+
+# Binance 설정
+BINANCE_POOL_SIZE = int(os.getenv('BINANCE_POOL_SIZE', 4)) # keep-alive 커넥션 풀 크기 (동시 요청 수)
+
+# MongoDB 설정
+MONGO_URI = os.getenv('MONGO_URI', "mongodb://localhost:27017/")
+MONGO_MAX_POOL_SIZE = int(os.getenv('MONGO_MAX_POOL_SIZE', 20))
+MONGO_TIMEOUT_MS = int(os.getenv('MONGO_TIMEOUT_MS', 5000)) # 서버 선택/연결 타임아웃
+MONGO_WRITE_CONCERN = os.getenv('MONGO_WRITE_CONCERN', "1") # "1", "majority" 등
+
+# 프로세스 전체에서 공유하는 클라이언트 (최초 요청 시 생성)
+_lock = threading.Lock()
+_binance_client = None
+_mongo_client = None
+
+# 장기 사용 Binance 클라이언트 반환
+# 생성 시 한 번만 세션을 열고 ping하며, 이후 모든 요청은 같은 keep-alive 커넥션 풀을 재사용합니다.
+def get_binance_client(pool_size=None):
+    global _binance_client
+    with _lock:
+        if _binance_client is None:
+            pool_size = pool_size or BINANCE_POOL_SIZE
+            client = Client(os.getenv('BINANCE_API_KEY'), os.getenv('BINANCE_SECRET_KEY'))
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            client.session.mount("https://", adapter)
+            client.session.mount("http://", adapter)
+            _binance_client = client
+        return _binance_client
+
+# 설정(풀 크기, 타임아웃, write concern)이 적용된 공유 MongoClient 반환
+def get_mongo_client():
+    global _mongo_client
+    with _lock:
+        if _mongo_client is None:
+            w = int(MONGO_WRITE_CONCERN) if MONGO_WRITE_CONCERN.isdigit() else MONGO_WRITE_CONCERN
+            _mongo_client = MongoClient(
+                MONGO_URI,
+                maxPoolSize=MONGO_MAX_POOL_SIZE,
+                serverSelectionTimeoutMS=MONGO_TIMEOUT_MS,
+                connectTimeoutMS=MONGO_TIMEOUT_MS,
+                w=w
+            )
+        return _mongo_client
+
+# 공유 클라이언트 정리 (HTTP 세션과 Mongo 커넥션 풀 종료). 여러 번 호출해도 안전합니다.
+def close_clients():
+    global _binance_client, _mongo_client
+    with _lock:
+        if _binance_client is not None:
+            try:
+                _binance_client.close_connection()
+            except Exception as e:
+                print(f"Binance 클라이언트 종료 중 오류: {e}")
+            _binance_client = None
+        if _mongo_client is not None:
+            _mongo_client.close()
+            _mongo_client = None
+
+atexit.register(close_clients)
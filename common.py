@@ -1,13 +1,14 @@
 import os
+import json
 import time
 import pandas as pd
 from datetime import datetime, timedelta
-from pymongo import MongoClient
 from dotenv import load_dotenv
 import numpy as np
-import pandas_ta as ta
 import requests
 import openai
+from clients import get_mongo_client
+from indicators import DEFAULT_INDICATOR_SPECS, compute_indicators, required_candles
 
 # 환경 변수 로드
 load_dotenv()
@@ -18,10 +19,11 @@ api_secret = os.getenv('BINANCE_SECRET_KEY')
 
 # OpenAI API 키
 openai_api_key = os.getenv('OPENAI_API_KEY')
+GPT_RATE_LIMIT_RETRIES = 3 # 요청 한도 초과(429) 시 재시도 횟수
+GPT_RATE_LIMIT_BACKOFF_SECONDS = 20 # 첫 재시도 전 대기 시간 (재시도마다 두 배)
 
-# MongoDB 연결
-mongo_uri = os.getenv('MONGO_URI', "mongodb://localhost:27017/")
-client_mongo = MongoClient(mongo_uri)
+# MongoDB 연결 (clients.py의 공유 클라이언트 사용)
+client_mongo = get_mongo_client()
 db = client_mongo['crypto_data'] # 데이터베이스 이름
 
 # 날짜별 통합 문서 컬렉션
@@ -60,6 +62,11 @@ def fetch_historical_klines(binance_client, symbol, interval, start_str, end_str
             return pd.DataFrame()
     start_time_ms = int(start_dt.timestamp() * 1000)
     end_time_ms = int(end_dt.timestamp() * 1000)
+    return fetch_klines_range(binance_client, symbol, interval, start_time_ms, end_time_ms)
+
+# 밀리초 타임스탬프 구간 [start_time_ms, end_time_ms]의 캔들 데이터를 가져오는 함수
+# (데몬 모드에서 새로 마감된 캔들만 가져올 때 사용)
+def fetch_klines_range(binance_client, symbol, interval, start_time_ms, end_time_ms):
     all_klines_data = []
     limit = 1000
     current_start_time = start_time_ms
@@ -100,78 +107,18 @@ def fetch_historical_klines(binance_client, symbol, interval, start_str, end_str
     print(f"{symbol} {interval} 캔들 데이터 {len(df)}개 로드 완료.")
     return df
 
-def calculate_all_indicators(df):
-    # 지표 계산에 필요한 최소 데이터 개수 확인
-    # MA 200, Ichimoku 52가 가장 긴 기간이므로, 최소 200개 이상의 캔들이 필요합니다.
-    if df.empty or len(df) < max(200, 52):
+# 지표 스펙 목록(indicators.DEFAULT_INDICATOR_SPECS 형식)에 있는 기술 지표만 계산
+# 공유 중간값(SMA/EMA/True Range/롤링 고저가 등)은 IndicatorPlanner가 한 번만 계산합니다.
+def calculate_all_indicators(df, specs=None):
+    specs = DEFAULT_INDICATOR_SPECS if specs is None else specs
+    # 지표 계산에 필요한 최소 데이터 개수 확인 (기본 스펙은 MA 200이 가장 긴 기간)
+    min_candles = required_candles(specs)
+    if df.empty or len(df) < min_candles:
         print("지표 계산에 필요한 데이터가 부족합니다.")
         return df # 원본 DataFrame 반환 (지표 열 없이)
 
-    print("기술 지표 계산 시작...")
-
-    # 이동 평균 (MA) - 종가 기준
-    for p in [5, 10, 20, 50, 60, 100, 200]:
-        df.ta.sma(close=df["close"], length=p, append=True)
-        df.ta.ema(close=df["close"], length=p, append=True)
-    
-    # MACD - 종가 기준
-    for fast, slow, sig in [(12,26,9), (24,52,18), (19,39,9)]:
-        df.ta.macd(close=df["close"], fast=fast, slow=slow, signal=sig, append=True)
-
-    # RSI - 종가 기준
-    for L in [7,14,21]:
-        df.ta.rsi(close=df["close"], length=L, append=True)
-
-    # 스토캐스틱 오실레이터 - 고가, 저가, 종가 기준 (표준 계산 방식)
-    for k, d in [(5,3),(9,3),(14,3)]:
-        df.ta.stoch(high=df["high"], low=df["low"], close=df["close"], k=k, d=d, append=True)
-
-    # 볼린저 밴드 - 종가 기준
-    for L in [10,20,50]:
-        df.ta.bbands(close=df["close"], length=L, std=2, append=True)
-
-    # ATR - 고가, 저가, 종가 기준 (표준 계산 방식)
-    for L in [7,14,28]:
-        df.ta.atr(high=df["high"], low=df["low"], close=df["close"], length=L, append=True)
-
-    # OBV 및 OBV SMA - 종가 및 거래량 기준
-    df.ta.obv(close=df["close"], volume=df["volume"], append=True)
-
-    for L in [10,20,50]:
-        # OBV의 이동 평균 계산
-        df.ta.sma(close=df["OBV"], length=L, append=True, prefix="OBV_")
-
-    # Ichimoku Cloud - 고가, 저가, 종가 기준
-    df.ta.ichimoku(high=df["high"], low=df["low"], close=df["close"],
-                   tenkan=9, kijun=26, senkou_b=52,
-                   append=True)
-    
-    # Supertrend - 고가, 저가, 종가 기준
-    for L in [10,14,21]:
-        df.ta.supertrend(high=df["high"], low=df["low"], close=df["close"],
-                         length=L, multiplier=3, append=True)
-        
-    # 피보나치 되돌림 (open_time 인덱스 기준, 최근 1개월)
-    fib_levels = {}
-    recent_data_for_fib = df.tail(30)  # open_time 인덱스 기준 최근 30개 캔들
-    if not recent_data_for_fib.empty and len(recent_data_for_fib) > 1:
-        recent_high = recent_data_for_fib['high'].max()
-        recent_low = recent_data_for_fib['low'].min()
-        price_range = recent_high - recent_low
-        fib_ratios = [0, 0.236, 0.382, 0.5, 0.618, 0.786, 1, 1.272, 1.618]
-        rising = recent_data_for_fib['close'].iloc[-1] > recent_data_for_fib['close'].iloc[0]
-        for ratio in fib_ratios:
-            if rising:
-                level = recent_high - price_range * ratio
-            else:
-                level = recent_low  + price_range * ratio
-            key = f"FIB_{ratio}"
-            fib_levels[key] = level
-        for key, value in fib_levels.items():
-            df[key] = value
-        print(f"피보나치 되돌림 수준 (최근 1개월 고점 {recent_high:.2f}, 저점 {recent_low:.2f} 기준, open_time 기준) 계산 완료.")
-    else:
-        print("최근 1개월 데이터가 부족하여 피보나치 되돌림을 계산할 수 없습니다.")
+    print(f"기술 지표 계산 시작... ({len(specs)}개 스펙)")
+    df = compute_indicators(df, specs)
     print("기술 지표 계산 완료.")
     return df
 
@@ -284,6 +231,16 @@ def upsert_daily_market_document(date, market_data=None, community_summary=None,
         upsert=True
     )
 
+# 다른 심볼의 데이터는 유지한 채 market_data.<symbol> 필드만 갱신 (데몬 모드처럼 심볼별로 갱신할 때 사용)
+def upsert_market_data_by_symbol(date, market_data):
+    if not market_data:
+        return
+    daily_market_collection.update_one(
+        {"date": date},
+        {"$set": {f"market_data.{symbol}": data for symbol, data in market_data.items()}},
+        upsert=True
+    )
+
 # GPT-4o를 활용한 커뮤니티 요약 생성
 def call_gpt_community_summary(date_str):
     if not openai_api_key:
@@ -320,4 +277,104 @@ def call_gpt_macro_summary(date_str):
         return response.choices[0].message.content.strip()
     except Exception as e:
         print(f"GPT 거시경제 요약 오류: {e}")
-        return f"GPT 거시경제 요약 오류: {e}"
\ No newline at end of file
+        return f"GPT 거시경제 요약 오류: {e}"
+
+# 커뮤니티/거시경제 요약을 날짜별로 한 번에 받기 위한 JSON 스키마 (Structured Outputs)
+DAILY_SUMMARIES_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "summaries": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "date": {"type": "string"},
+                    "community_summary": {"type": "string"},
+                    "macro_summary": {"type": "string"}
+                },
+                "required": ["date", "community_summary", "macro_summary"],
+                "additionalProperties": False
+            }
+        }
+    },
+    "required": ["summaries"],
+    "additionalProperties": False
+}
+
+# 응답 JSON에서 요청한 날짜의 요약만 골라내는 함수 (형식이 잘못된 항목은 건너뜀)
+def parse_daily_summaries(content, date_strs):
+    try:
+        items = json.loads(content).get("summaries", [])
+    except (json.JSONDecodeError, TypeError, AttributeError):
+        return {}
+    summaries = {}
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict) or item.get("date") not in date_strs:
+            continue
+        community_summary = item.get("community_summary")
+        macro_summary = item.get("macro_summary")
+        if not (isinstance(community_summary, str) and community_summary.strip()
+                and isinstance(macro_summary, str) and macro_summary.strip()):
+            continue
+        summaries[item["date"]] = (community_summary.strip(), macro_summary.strip())
+    return summaries
+
+# 여러 날짜의 커뮤니티/거시경제 요약을 Structured Outputs 한 번의 호출로 요청해 {date_str: (커뮤니티, 거시경제)}로 반환
+# 요청 한도 초과(429) 시에는 대기 시간을 늘려 가며 재시도하고, 그 외 오류나 재시도 소진 시 예외를 그대로 올립니다.
+def request_daily_summaries(client, date_strs):
+    prompt = (
+        f"다음 날짜 각각에 대해 두 가지 요약을 작성해줘: {', '.join(date_strs)}\n"
+        "1. community_summary: 해당 날짜에 작성된 암호화폐 관련 레딧, 트위터, 커뮤니티 게시글과 반응을 요약. "
+        "주요 이슈, 투자심리, 논쟁거리, 시장 분위기를 한글로 10문장 이내로 정리.\n"
+        "2. macro_summary: 해당 날짜에 발표된 암호화폐 및 거시경제 관련 주요 뉴스, 정책, 경제지표, 글로벌 이슈를 "
+        "암호화폐 시장에 영향을 줄 만한 거시경제 이벤트 중심으로 한글로 10문장 이내로 요약.\n"
+        "summaries 배열에 날짜마다 하나씩, date 필드는 위 날짜 문자열(YYYY-MM-DD) 그대로 넣어줘."
+    )
+    for attempt in range(GPT_RATE_LIMIT_RETRIES + 1):
+        try:
+            response = client.chat.completions.create(
+                model="gpt-4o",
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.7,
+                max_tokens=min(2048 * len(date_strs), 16384), # 날짜당 요약 2개 분량
+                response_format={
+                    "type": "json_schema",
+                    "json_schema": {"name": "daily_summaries", "schema": DAILY_SUMMARIES_SCHEMA, "strict": True}
+                }
+            )
+            return parse_daily_summaries(response.choices[0].message.content, date_strs)
+        except openai.RateLimitError as e:
+            if attempt == GPT_RATE_LIMIT_RETRIES:
+                raise
+            backoff_seconds = GPT_RATE_LIMIT_BACKOFF_SECONDS * 2 ** attempt
+            print(f"GPT 요청 한도 초과: {e}. {backoff_seconds}초 후 다시 시도합니다.")
+            time.sleep(backoff_seconds)
+
+# GPT-4o 한 번의 호출로 여러 날짜의 커뮤니티/거시경제 요약을 함께 생성
+# 응답에서 빠졌거나 호출이 실패한 날짜는 날짜별 단일 호출로 다시 요청하고,
+# 그것도 실패한 날짜만 기존 개별 요약 함수로 대체합니다.
+# 반환값: {date_str: (community_summary, macro_summary)}
+def call_gpt_daily_summaries(date_strs):
+    date_strs = list(date_strs)
+    if not openai_api_key:
+        print("OPENAI_API_KEY가 설정되지 않았습니다. GPT API 호출을 건너뜁니다.")
+        return {date_str: ("API 키 없음", "API 키 없음") for date_str in date_strs}
+    client = openai.OpenAI(api_key=openai_api_key)
+    summaries = {}
+    try:
+        summaries = request_daily_summaries(client, date_strs)
+    except Exception as e:
+        print(f"GPT 통합 요약 오류: {e}")
+    for date_str in date_strs:
+        if date_str in summaries:
+            continue
+        if len(date_strs) > 1:
+            print(f"{date_str} 통합 요약 결과 없음. 날짜별 요약 호출로 다시 요청합니다.")
+            try:
+                summaries.update(request_daily_summaries(client, [date_str]))
+            except Exception as e:
+                print(f"{date_str} GPT 날짜별 요약 오류: {e}")
+        if date_str not in summaries:
+            print(f"{date_str} 요약 결과 없음. 개별 요약 호출로 대체합니다.")
+            summaries[date_str] = (call_gpt_community_summary(date_str), call_gpt_macro_summary(date_str))
+    return summaries
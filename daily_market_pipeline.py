@@ -1,52 +1,262 @@
 from binance.client import Client
-from common import api_key, api_secret, fetch_historical_klines, calculate_all_indicators, upsert_daily_market_document, call_gpt_community_summary, call_gpt_macro_summary, prepare_market_data_documents_for_mongo
-from datetime import datetime, timedelta
+from clients import get_binance_client, close_clients
+from common import fetch_historical_klines, fetch_klines_range, interval_to_milliseconds, calculate_all_indicators, upsert_daily_market_document, upsert_market_data_by_symbol, call_gpt_daily_summaries, prepare_market_data_documents_for_mongo
+from indicators import DEFAULT_INDICATOR_SPECS, required_candles
+from kline_stream import KlineStream
+from parquet_store import export_indicator_frame
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+import argparse
+import asyncio
+import signal
+import threading
 import time
+import pandas as pd
+
+SYMBOLS = ['BTCUSDT', 'ETHUSDT'] # 여기에 원하는 심볼을 추가
+INTERVAL = Client.KLINE_INTERVAL_1DAY
+START_DATE_STR = '2023-01-01' # 시작 날짜
+END_DATE_STR = '2023-01-05' # 종료 날짜
+PERPLEXITY_SLEEP_SECONDS = 3 * 60
+FETCH_CONCURRENCY = len(SYMBOLS) # Binance keep-alive 커넥션 풀 크기
+LLM_BATCH_DAYS = 5 # 한 번의 GPT 호출로 요약할 날짜 수 (백필 시 요청 수 절감)
+# 계산할 기술 지표 스펙 목록. 일부 지표만 필요하면 예: [("RSI", {"length": 14}), ("MACD", {"fast": 12, "slow": 26, "signal": 9})]
+INDICATOR_SPECS = DEFAULT_INDICATOR_SPECS
+LOOKBACK_CANDLES = 250 # 지표 계산을 위해 불러오는 과거 캔들 수
+CANDLE_CLOSE_GRACE_SECONDS = 2 # 데몬 모드: 캔들 마감 후 Binance에 반영될 때까지 기다리는 시간
+NEW_CANDLE_RETRIES = 5 # 데몬 모드: 마감된 캔들이 아직 조회되지 않을 때 재시도 횟수
+DAY_MS = 24 * 60 * 60 * 1000
+EXPORT_PARQUET = True # 지표 계산 결과를 parquet_store.PARQUET_ROOT에 Parquet으로 함께 내보낼지 여부
 
-if __name__ == "__main__":
-    SYMBOLS = ['BTCUSDT', 'ETHUSDT'] # 여기에 원하는 심볼을 추가
-    INTERVAL = Client.KLINE_INTERVAL_1DAY
-    START_DATE_STR = '2023-01-01' # 시작 날짜
-    END_DATE_STR = '2023-01-05' # 종료 날짜
-    PERPLEXITY_SLEEP_SECONDS = 3 * 60
 
+# 시작~종료 날짜 범위를 한 번에 적재하는 백필 모드
+def run_backfill(binance_client):
     start_date = datetime.strptime(START_DATE_STR, '%Y-%m-%d').date()
     end_date = datetime.strptime(END_DATE_STR, '%Y-%m-%d').date()
 
-    # 날짜 범위 내의 모든 날짜에 대해 반복
-    for current_date in (start_date + timedelta(days=n) for n in range((end_date - start_date).days + 1)):
-        date_str = current_date.strftime('%Y-%m-%d')
-        market_data_dict = {}
-        for symbol in SYMBOLS:
-            lookback_start = (current_date - timedelta(days=250)).strftime('%Y-%m-%d')
-            df = fetch_historical_klines(Client(api_key, api_secret), symbol, INTERVAL, lookback_start, date_str) # 가격 데이터 가져오기
-            if df.empty:
-                continue
-            
-            df = calculate_all_indicators(df) # 가격 데이터로 기술 지표 계산해 추가
-
-            # open_time의 date만 비교해서 해당 날짜의 모든 캔들 추출
-            daily_row = df[df.index.date == current_date]
-            if daily_row.empty:
-                print(f"{symbol} {date_str}에 해당하는 open_time 데이터 없음")
-                continue
-            market_data_dict[symbol] = prepare_market_data_documents_for_mongo(daily_row, symbol, INTERVAL) # 시장 데이터 문서 준비
-        
-        community_summary = call_gpt_community_summary(date_str) # 커뮤니티 요약 생성
-        macro_summary = call_gpt_macro_summary(date_str) # 거시경제 요약 생성
-
-        # MongoDB에 문서 삽입 또는 업데이트
-        upsert_daily_market_document(
-            date_str,
-            market_data=market_data_dict,
-            community_summary=community_summary,
-            macro_summary=macro_summary
-        )
-        print(f"{current_date} 저장 완료 (market_data count: {len(market_data_dict)})")
-
-        # 3분 간격으로 호출
-        if current_date < end_date:
+    all_dates = [start_date + timedelta(days=n) for n in range((end_date - start_date).days + 1)]
+    date_batches = [all_dates[i:i + LLM_BATCH_DAYS] for i in range(0, len(all_dates), LLM_BATCH_DAYS)]
+
+    # 날짜 범위를 LLM_BATCH_DAYS 단위로 나눠 반복
+    for batch_index, date_batch in enumerate(date_batches):
+        # 배치 내 모든 날짜의 커뮤니티/거시경제 요약을 한 번의 호출로 생성
+        summaries = call_gpt_daily_summaries([d.strftime('%Y-%m-%d') for d in date_batch])
+
+        for current_date in date_batch:
+            date_str = current_date.strftime('%Y-%m-%d')
+            market_data_dict = {}
+            for symbol in SYMBOLS:
+                lookback_start = (current_date - timedelta(days=LOOKBACK_CANDLES)).strftime('%Y-%m-%d')
+                df = fetch_historical_klines(binance_client, symbol, INTERVAL, lookback_start, date_str) # 가격 데이터 가져오기
+                if df.empty:
+                    continue
+
+                df = calculate_all_indicators(df, INDICATOR_SPECS) # 가격 데이터로 기술 지표 계산해 추가
+
+                # open_time의 date만 비교해서 해당 날짜의 모든 캔들 추출
+                daily_row = df[df.index.date == current_date]
+                if daily_row.empty:
+                    print(f"{symbol} {date_str}에 해당하는 open_time 데이터 없음")
+                    continue
+                market_data_dict[symbol] = prepare_market_data_documents_for_mongo(daily_row, symbol, INTERVAL) # 시장 데이터 문서 준비
+                if EXPORT_PARQUET:
+                    export_indicator_frame(daily_row, symbol, INTERVAL) # 연구용 지표 히스토리 Parquet 추가
+
+            community_summary, macro_summary = summaries[date_str]
+
+            # MongoDB에 문서 삽입 또는 업데이트
+            upsert_daily_market_document(
+                date_str,
+                market_data=market_data_dict,
+                community_summary=community_summary,
+                macro_summary=macro_summary
+            )
+            print(f"{current_date} 저장 완료 (market_data count: {len(market_data_dict)})")
+
+        # GPT 호출 배치 사이에 3분 간격 유지
+        if batch_index < len(date_batches) - 1:
             print(f"--- {PERPLEXITY_SLEEP_SECONDS // 60}분 휴식 ---\n")
             time.sleep(PERPLEXITY_SLEEP_SECONDS)
 
-    print("통합 파이프라인 실행 완료.") 
\ No newline at end of file
+
+# 현재 시각 이후 가장 가까운 UTC 캔들 마감 시각(ms)
+# Binance 캔들은 epoch 기준으로 정렬되므로 일 단위 이하 인터벌에서만 정확합니다.
+def next_candle_close_ms(now_ms, interval_ms):
+    return (now_ms // interval_ms + 1) * interval_ms
+
+# 날짜별 커뮤니티/거시경제 요약을 생성해 저장 (데몬 모드에서 백그라운드 스레드로 실행)
+def summarize_and_upsert(date_str):
+    community_summary, macro_summary = call_gpt_daily_summaries([date_str])[date_str]
+    upsert_daily_market_document(date_str, community_summary=community_summary, macro_summary=macro_summary)
+    print(f"{date_str} 요약 저장 완료")
+
+# 요약 작업을 백그라운드에 제출하고, 실패하면 로그를 남기도록 done-callback 등록
+def submit_summary(summary_executor, date_str):
+    def log_failure(future):
+        if future.exception() is not None:
+            print(f"{date_str} 요약 생성/저장 실패: {future.exception()}")
+    summary_executor.submit(summarize_and_upsert, date_str).add_done_callback(log_failure)
+
+# 새로 마감된 캔들만 가져와 심볼별 과거 데이터에 추가하고 최근 lookback개만 유지
+# (갱신된 과거 데이터, 새로 추가된 캔들의 open_time 인덱스)를 반환하며, 가져오지 못하면 새 캔들은 비어 있습니다.
+def append_closed_candles(binance_client, history, symbol, close_ms, lookback, stop_event):
+    start_ms = int(history.index[-1].timestamp() * 1000) + 1
+    for _ in range(NEW_CANDLE_RETRIES):
+        new_df = fetch_klines_range(binance_client, symbol, INTERVAL, start_ms, close_ms - 1)
+        if not new_df.empty:
+            combined = pd.concat([history, new_df])
+            combined = combined[~combined.index.duplicated(keep='last')].tail(lookback)
+            return combined, new_df.index[new_df.index > history.index[-1]]
+        # 마감 직후에는 아직 조회되지 않을 수 있으므로 잠시 후 재시도
+        if stop_event.wait(CANDLE_CLOSE_GRACE_SECONDS):
+            break
+    print(f"{symbol} 새로 마감된 캔들을 가져오지 못했습니다. 다음 마감에 이어서 가져옵니다.")
+    return history, history.index[:0]
+
+# (prev_close_ms, close_ms] 구간에서 끝난 UTC 날짜 목록 (마감을 건너뛴 경우에도 하루도 빠뜨리지 않도록)
+def completed_days(prev_close_ms, close_ms):
+    return [
+        datetime.fromtimestamp((boundary_ms - 1) / 1000, tz=timezone.utc).strftime('%Y-%m-%d')
+        for boundary_ms in range((prev_close_ms // DAY_MS + 1) * DAY_MS, close_ms + 1, DAY_MS)
+    ]
+
+# INTERVAL 캔들이 마감될 때마다 새 캔들만 가져와 지표를 갱신하고 daily_market 문서를 upsert하는 데몬 모드
+def run_daemon(binance_client):
+    interval_ms = interval_to_milliseconds(INTERVAL)
+    if interval_ms is None or interval_ms > DAY_MS:
+        raise ValueError(f"데몬 모드는 일 단위 이하 인터벌만 지원합니다: {INTERVAL}")
+    lookback = max(LOOKBACK_CANDLES, required_candles(INDICATOR_SPECS))
+
+    stop_event = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop_event.set())
+
+    # 시작 시 심볼별 과거 캔들을 한 번만 불러와 메모리에 유지
+    last_close_ms = next_candle_close_ms(int(time.time() * 1000), interval_ms) - interval_ms
+    history = {}
+    for symbol in SYMBOLS:
+        df = fetch_klines_range(binance_client, symbol, INTERVAL, last_close_ms - lookback * interval_ms, last_close_ms - 1)
+        if df.empty:
+            print(f"{symbol} 초기 데이터를 불러오지 못해 데몬 대상에서 제외합니다.")
+            continue
+        history[symbol] = df
+
+    # LLM 요약은 시장 데이터 저장을 지연시키지 않도록 별도 스레드에서 실행
+    summary_executor = ThreadPoolExecutor(max_workers=1)
+    print(f"데몬 모드 시작: {', '.join(history)} {INTERVAL}")
+    try:
+        while not stop_event.is_set():
+            close_ms = next_candle_close_ms(int(time.time() * 1000), interval_ms)
+            print(f"다음 캔들 마감 대기: {datetime.fromtimestamp(close_ms / 1000, tz=timezone.utc).isoformat()}")
+            wait_seconds = (close_ms - time.time() * 1000) / 1000 + CANDLE_CLOSE_GRACE_SECONDS
+            if stop_event.wait(max(wait_seconds, 0)):
+                break
+
+            # 한 심볼/한 번의 저장 오류로 데몬이 종료되지 않도록 로그만 남기고 다음 마감으로 진행
+            market_data_by_date = {}
+            for symbol in history:
+                try:
+                    history[symbol], new_index = append_closed_candles(binance_client, history[symbol], symbol, close_ms, lookback, stop_event)
+                    if new_index.empty:
+                        continue
+                    df = calculate_all_indicators(history[symbol], INDICATOR_SPECS) # 가격 데이터로 기술 지표 계산해 추가
+                    # 지난 마감 이후 새로 추가된 캔들을 모두 저장 (놓친 마감이 있어도 건너뛰지 않음)
+                    # 같은 날짜에 여러 캔들이 있으면 스트리밍 모드처럼 순서대로 덮어써 마지막 캔들이 남습니다.
+                    new_rows = df[df.index.isin(new_index)]
+                    for open_time in new_rows.index:
+                        row = new_rows.loc[[open_time]]
+                        market_data_by_date.setdefault(open_time.strftime('%Y-%m-%d'), {})[symbol] = prepare_market_data_documents_for_mongo(row, symbol, INTERVAL)
+                    if EXPORT_PARQUET:
+                        export_indicator_frame(new_rows, symbol, INTERVAL) # 연구용 지표 히스토리 Parquet 추가
+                except Exception as e:
+                    print(f"{symbol} 캔들 처리 중 오류 발생: {e}. 다음 마감에 다시 시도합니다.")
+
+            # 다른 심볼 데이터를 덮어쓰지 않도록 market_data.<symbol> 단위로 저장
+            for date_str, market_data_dict in market_data_by_date.items():
+                try:
+                    upsert_market_data_by_symbol(date_str, market_data_dict)
+                    print(f"{date_str} 시장 데이터 저장 완료 (market_data count: {len(market_data_dict)})")
+                except Exception as e:
+                    print(f"{date_str} 시장 데이터 저장 중 오류 발생: {e}")
+
+            # 지난 마감 이후 지나간 UTC 날짜 경계마다 해당 날짜 요약을 비동기로 생성
+            for summary_date_str in completed_days(last_close_ms, close_ms):
+                submit_summary(summary_executor, summary_date_str)
+            last_close_ms = close_ms
+    finally:
+        print("데몬 종료 중... 진행 중인 요약 작업을 기다립니다.")
+        summary_executor.shutdown(wait=True)
+
+
+# Binance kline 웹소켓으로 마감 캔들을 받아 심볼별 링 버퍼(최근 lookback개 고정)에서 지표를 계산하는 스트리밍 모드
+# REST 폴링 없이 심볼 수가 많아도 심볼당 메모리가 일정하게 유지됩니다.
+def run_stream(binance_client):
+    interval_ms = interval_to_milliseconds(INTERVAL)
+    if interval_ms is None or interval_ms > DAY_MS:
+        raise ValueError(f"스트리밍 모드는 일 단위 이하 인터벌만 지원합니다: {INTERVAL}")
+    lookback = max(LOOKBACK_CANDLES, required_candles(INDICATOR_SPECS))
+    summary_executor = ThreadPoolExecutor(max_workers=1)
+    summarized_dates = set()
+    summarized_lock = threading.Lock()
+
+    # KlineStream이 워커 스레드에서 호출 (frame은 해당 캔들까지의 링 버퍼 스냅샷으로, 최대 lookback개를 복사한 DataFrame)
+    def on_closed_candle(symbol, frame, kline):
+        df = calculate_all_indicators(frame, INDICATOR_SPECS)
+        latest_row = df.tail(1)
+        date_str = latest_row.index[-1].strftime('%Y-%m-%d')
+        upsert_market_data_by_symbol(date_str, {symbol: prepare_market_data_documents_for_mongo(latest_row, symbol, INTERVAL)})
+        if EXPORT_PARQUET:
+            export_indicator_frame(latest_row, symbol, INTERVAL) # 연구용 지표 히스토리 Parquet 추가
+        print(f"{date_str} {symbol} 시장 데이터 저장 완료")
+        # UTC 하루가 끝나는 캔들이면 해당 날짜 요약을 비동기로 한 번만 생성
+        close_ms = int(kline["T"]) + 1
+        if close_ms % DAY_MS == 0:
+            with summarized_lock:
+                if date_str in summarized_dates:
+                    return
+                summarized_dates.add(date_str)
+            submit_summary(summary_executor, date_str)
+
+    stream = KlineStream(SYMBOLS, INTERVAL, lookback, on_closed_candle=on_closed_candle)
+
+    async def main():
+        stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop_event.set)
+        stream_task = asyncio.create_task(stream.run(stop_event, binance_client))
+        stop_task = asyncio.create_task(stop_event.wait())
+        # 종료 신호 또는 스트림 작업 실패 중 먼저 일어난 쪽에서 빠져나옴 (실패 시 멈춘 채 대기하지 않도록)
+        done, _ = await asyncio.wait({stream_task, stop_task}, return_when=asyncio.FIRST_COMPLETED)
+        stop_event.set()
+        stream_task.cancel()
+        stop_task.cancel()
+        await asyncio.gather(stream_task, stop_task, return_exceptions=True)
+        if stream_task in done and not stream_task.cancelled() and stream_task.exception() is not None:
+            raise stream_task.exception()
+
+    print(f"스트리밍 모드 시작: {', '.join(SYMBOLS)} {INTERVAL}")
+    try:
+        asyncio.run(main())
+    finally:
+        print("스트리밍 종료 중... 진행 중인 요약 작업을 기다립니다.")
+        summary_executor.shutdown(wait=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="일별 시장 데이터 통합 파이프라인")
+    parser.add_argument("--daemon", action="store_true", help="INTERVAL 캔들 마감마다 갱신하는 데몬 모드로 실행")
+    parser.add_argument("--stream", action="store_true", help="Binance kline 웹소켓으로 마감 캔들을 받는 스트리밍 모드로 실행")
+    args = parser.parse_args()
+
+    binance_client = get_binance_client(pool_size=FETCH_CONCURRENCY) # 실행 전체에서 하나의 클라이언트 재사용
+    try:
+        if args.stream:
+            run_stream(binance_client)
+        elif args.daemon:
+            run_daemon(binance_client)
+        else:
+            run_backfill(binance_client)
+    finally:
+        close_clients()
+    print("통합 파이프라인 실행 완료.")
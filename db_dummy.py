@@ -1,12 +1,14 @@
 # -*- coding: utf-8 -*-
 import datetime
 import pandas as pd
-from pymongo import MongoClient
+from clients import get_mongo_client, close_clients
 import random
 
 # --- 1. 기본 설정 및 DB 연결 ---
-client = MongoClient('mongodb://localhost:27017/')
+client = get_mongo_client()
 db = client['crypto_agent_db']
+# 파이프라인(daily_market_pipeline.py)이 적재한 날짜별 시장 데이터 컬렉션
+daily_market_collection = client['crypto_data']['daily_market']
 # 이전 실행 데이터를 초기화하여 항상 새로운 상태에서 시작
 for collection_name in db.list_collection_names():
     db[collection_name].drop()
@@ -22,6 +24,7 @@ DEPARTMENTS = [
     "News-Sentiment_Reader"
 ]
 TODAY_STR = datetime.date(2025, 6, 30).strftime("%Y-%m-%d")
+SYMBOLS = ["BTCUSDT", "ETHUSDT"] # 시장 스냅샷에 포함할 심볼
 LOOP = 12
 EPISODE = 5
 
@@ -112,29 +115,54 @@ def create_memory_guideline(dept):
         "style_guide": style_guide_map[dept]
     }
 
-def create_market_snapshot():
-    """시장 스냅샷 데이터를 생성합니다."""
-    return {
-        "date": TODAY_STR,
+# 날짜별 시장 스냅샷 캐시 ((date, symbols) -> snapshot). 모든 부서가 같은 스냅샷을 공유합니다.
+_market_snapshot_cache = {}
+
+def create_market_snapshot(date_str=TODAY_STR, symbols=SYMBOLS):
+    """
+    daily_market 컬렉션에서 시장 스냅샷 데이터를 생성합니다.
+    심볼 수와 관계없이 필요한 필드만 projection한 단일 쿼리로 가져오며, 결과는 날짜별로 캐시됩니다.
+    """
+    cache_key = (date_str, tuple(symbols))
+    if cache_key in _market_snapshot_cache:
+        return _market_snapshot_cache[cache_key]
+
+    # 심볼별로 필요한 필드 경로만 projection (전체 문서를 가져오지 않음)
+    field_paths = {
+        "p": "chart_data.close",
+        "v": "chart_data.volume",
+        "rsi14": "technical_indicators.RSI.RSI-14",
+        "macd": "technical_indicators.MACD.MACD-12-26-9",
+    }
+    projection = {"_id": 0}
+    for symbol in symbols:
+        for path in field_paths.values():
+            projection[f"market_data.{symbol}.{path}"] = 1
+    doc = daily_market_collection.find_one({"date": date_str}, projection) or {}
+    if not doc:
+        print(f"daily_market에 {date_str} 문서가 없습니다. 시장 스냅샷 값이 비어 있습니다.")
+
+    symbols_data = {}
+    for symbol in symbols:
+        symbol_doc = doc.get("market_data", {}).get(symbol, {})
+        values = {}
+        for field, path in field_paths.items():
+            value = symbol_doc
+            for key in path.split("."):
+                value = value.get(key) if isinstance(value, dict) else None
+            values[field] = value
+        symbols_data[symbol] = values
+
+    snapshot = {
+        "date": date_str,
         "timestamp_utc": get_utc_timestamp(),
-        "symbols": {
-            "BTCUSDT": {
-                "p": 61234.5 + random.uniform(-100, 100),
-                "v": 34750.2,
-                "rsi14": 62.1,
-                "macd": -45.3
-            },
-            "ETHUSDT": {
-                "p": 3412.7,
-                "v": 18210.1,
-                "rsi14": 58.8,
-                "macd": 3.4
-            }
-        },
+        "symbols": symbols_data,
         "research_reports": [
             "Glassnode Report (Summary): BTC futures open interest reaches 6-month high."
         ]
     }
+    _market_snapshot_cache[cache_key] = snapshot
+    return snapshot
 
 def create_portfolio_snapshot():
     """포트폴리오 스냅샷 데이터를 생성합니다."""
@@ -410,6 +438,9 @@ def seed_database_for_presentation():
     print("Starting database seeding for all 5 departments...")
     print("="*50)
 
+    # 시장 스냅샷은 부서와 무관하므로 한 번만 생성해 모든 부서가 공유
+    market_snapshot = create_market_snapshot(TODAY_STR, SYMBOLS)
+
     for dept in DEPARTMENTS:
         print(f"\nProcessing Department: [ {dept} ]")
 
@@ -427,7 +458,7 @@ def seed_database_for_presentation():
             'episode': EPISODE
         }
         snapshot_docs = {
-            'market': create_market_snapshot(),
+            'market': market_snapshot,
             'portfolio': create_portfolio_snapshot(),
             'decision': create_decision(dept, strategy_doc['cases'][0]['id']),
             'trade_memory_short': create_trade_memory('short'),
@@ -467,7 +498,7 @@ def seed_database_for_presentation():
     print("\n" + "="*50)
     print("Database seeding completed successfully for all departments.")
     print("="*50)
-    client.close()
+    close_clients()
 
 
 if __name__ == "__main__":
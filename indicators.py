@@ -0,0 +1,257 @@
+import numpy as np
+import pandas as pd
+import pandas_ta as ta
+from pandas_ta.utils import non_zero_range
+
+# 직접 구현한 지표(MACD, STOCH, BBANDS, ICHIMOKU, SUPERTREND)는 이 버전의 pandas_ta 계산식과 컬럼 이름을 따릅니다.
+# 0.4.x 이후에는 계산 결과와 컬럼 이름이 달라지므로 README의 설치 버전을 사용하세요.
+PANDAS_TA_VERSION = "0.3.14b0"
+if getattr(ta, "version", None) != PANDAS_TA_VERSION:
+    print(f"pandas_ta {getattr(ta, 'version', '알 수 없음')} 버전이 설치되어 있습니다. 지표 계산식은 {PANDAS_TA_VERSION} 기준입니다.")
+
+# --- 지표 스펙 ---
+# 각 지표는 (이름, 파라미터) 형태로 선언합니다. 예: ("RSI", {"length": 14})
+# 파이프라인은 필요한 지표 스펙 목록만 넘기면 되고, 플래너가 공유 중간값을 한 번만 계산합니다.
+FIB_RATIOS = [0, 0.236, 0.382, 0.5, 0.618, 0.786, 1, 1.272, 1.618]
+
+DEFAULT_INDICATOR_SPECS = (
+    [("SMA", {"length": p}) for p in [5, 10, 20, 50, 60, 100, 200]]
+    + [("EMA", {"length": p}) for p in [5, 10, 20, 50, 60, 100, 200]]
+    + [("MACD", {"fast": f, "slow": s, "signal": sig}) for f, s, sig in [(12, 26, 9), (24, 52, 18), (19, 39, 9)]]
+    + [("RSI", {"length": L}) for L in [7, 14, 21]]
+    + [("STOCH", {"k": k, "d": d}) for k, d in [(5, 3), (9, 3), (14, 3)]]
+    + [("BBANDS", {"length": L, "std": 2}) for L in [10, 20, 50]]
+    + [("ATR", {"length": L}) for L in [7, 14, 28]]
+    + [("OBV", {})]
+    + [("OBV_SMA", {"length": L}) for L in [10, 20, 50]]
+    + [("ICHIMOKU", {"tenkan": 9, "kijun": 26, "senkou": 52})]
+    + [("SUPERTREND", {"length": L, "multiplier": 3}) for L in [10, 14, 21]]
+    + [("FIB", {"window": 30})]
+)
+
+
+class IndicatorPlanner:
+    """
+    지표 사이에서 공유되는 중간값(SMA, EMA, True Range, ATR, 롤링 고가/저가 등)을
+    (종류, 파라미터) 키로 캐시해 프레임당 한 번만 계산합니다.
+    """
+
+    def __init__(self, df):
+        self.df = df
+        self._cache = {}
+
+    def _memo(self, key, compute):
+        if key not in self._cache:
+            self._cache[key] = compute()
+        return self._cache[key]
+
+    def source(self, name):
+        # OBV처럼 다른 지표를 입력으로 쓰는 경우도 같은 캐시를 사용
+        if name == "OBV":
+            return self.obv()
+        return self.df[name]
+
+    def sma(self, length, source="close"):
+        return self._memo(("sma", source, length), lambda: ta.sma(self.source(source), length=length))
+
+    def ema(self, length, source="close"):
+        return self._memo(("ema", source, length), lambda: ta.ema(self.source(source), length=length))
+
+    def stdev(self, length, ddof=0, source="close"):
+        return self._memo(("stdev", source, length, ddof), lambda: ta.stdev(self.source(source), length=length, ddof=ddof))
+
+    def true_range(self):
+        return self._memo(("true_range",), lambda: ta.true_range(self.df["high"], self.df["low"], self.df["close"]))
+
+    def atr(self, length):
+        # pandas_ta 기본값(mamode="rma")과 동일하게 True Range의 RMA로 계산
+        return self._memo(("atr", length), lambda: ta.rma(self.true_range(), length=length))
+
+    def highest(self, length):
+        return self._memo(("highest", length), lambda: self.df["high"].rolling(length, min_periods=length).max())
+
+    def lowest(self, length):
+        return self._memo(("lowest", length), lambda: self.df["low"].rolling(length, min_periods=length).min())
+
+    def midprice(self, length):
+        return self._memo(("midprice", length), lambda: 0.5 * (self.highest(length) + self.lowest(length)))
+
+    def obv(self):
+        return self._memo(("obv",), lambda: ta.obv(self.df["close"], self.df["volume"]))
+
+
+# --- 지표 레지스트리 ---
+# 이름 -> (계산 함수, 최소 필요 캔들 수 함수). 계산 함수는 {컬럼명: Series}를 반환하며,
+# 컬럼명은 prepare_market_data_documents_for_mongo가 기대하는 pandas_ta 이름 규칙을 따릅니다.
+INDICATORS = {}
+
+def register_indicator(name, lookback):
+    def decorator(fn):
+        INDICATORS[name] = (fn, lookback)
+        return fn
+    return decorator
+
+@register_indicator("SMA", lambda p: p["length"])
+def _sma(plan, length):
+    return {f"SMA_{length}": plan.sma(length)}
+
+@register_indicator("EMA", lambda p: p["length"])
+def _ema(plan, length):
+    return {f"EMA_{length}": plan.ema(length)}
+
+@register_indicator("MACD", lambda p: p["slow"] + p["signal"])
+def _macd(plan, fast, slow, signal):
+    macd = plan.ema(fast) - plan.ema(slow)
+    signal_ma = ta.ema(macd.loc[macd.first_valid_index():], length=signal)
+    props = f"_{fast}_{slow}_{signal}"
+    return {
+        f"MACD{props}": macd,
+        f"MACDh{props}": macd - signal_ma,
+        f"MACDs{props}": signal_ma,
+    }
+
+@register_indicator("RSI", lambda p: p["length"])
+def _rsi(plan, length):
+    return {f"RSI_{length}": ta.rsi(plan.df["close"], length=length)}
+
+@register_indicator("STOCH", lambda p: p["k"] + p["d"] + p.get("smooth_k", 3))
+def _stoch(plan, k, d, smooth_k=3):
+    lowest_low = plan.lowest(k)
+    stoch = 100 * (plan.df["close"] - lowest_low) / non_zero_range(plan.highest(k), lowest_low)
+    stoch_k = ta.sma(stoch.loc[stoch.first_valid_index():], length=smooth_k)
+    stoch_d = ta.sma(stoch_k.loc[stoch_k.first_valid_index():], length=d)
+    props = f"_{k}_{d}_{smooth_k}"
+    return {f"STOCHk{props}": stoch_k, f"STOCHd{props}": stoch_d}
+
+@register_indicator("BBANDS", lambda p: p["length"])
+def _bbands(plan, length, std=2):
+    std = float(std)
+    mid = plan.sma(length)
+    deviations = std * plan.stdev(length)
+    lower = mid - deviations
+    upper = mid + deviations
+    ulr = non_zero_range(upper, lower)
+    props = f"_{length}_{std}"
+    return {
+        f"BBL{props}": lower,
+        f"BBM{props}": mid,
+        f"BBU{props}": upper,
+        f"BBB{props}": 100 * ulr / mid,
+        f"BBP{props}": non_zero_range(plan.df["close"], lower) / ulr,
+    }
+
+@register_indicator("ATR", lambda p: p["length"] + 1)
+def _atr(plan, length):
+    return {f"ATRr_{length}": plan.atr(length)}
+
+@register_indicator("OBV", lambda p: 1)
+def _obv(plan):
+    return {"OBV": plan.obv()}
+
+@register_indicator("OBV_SMA", lambda p: p["length"])
+def _obv_sma(plan, length):
+    return {f"OBV_SMA_{length}": plan.sma(length, source="OBV")}
+
+@register_indicator("ICHIMOKU", lambda p: max(p["tenkan"], p["kijun"], p["senkou"]))
+def _ichimoku(plan, tenkan=9, kijun=26, senkou=52):
+    tenkan_sen = plan.midprice(tenkan)
+    kijun_sen = plan.midprice(kijun)
+    # pandas_ta와 동일하게 선행스팬은 kijun만큼 앞으로, 후행스팬은 kijun만큼 뒤로 이동
+    span_a = (0.5 * (tenkan_sen + kijun_sen)).shift(kijun)
+    span_b = plan.midprice(senkou).shift(kijun)
+    return {
+        f"ISA_{tenkan}": span_a,
+        f"ISB_{kijun}": span_b,
+        f"ITS_{tenkan}": tenkan_sen,
+        f"IKS_{kijun}": kijun_sen,
+        f"ICS_{kijun}": plan.df["close"].shift(-kijun),
+    }
+
+@register_indicator("SUPERTREND", lambda p: p["length"] + 1)
+def _supertrend(plan, length, multiplier=3):
+    multiplier = float(multiplier)
+    close = plan.df["close"].to_numpy()
+    hl2 = (0.5 * (plan.df["high"] + plan.df["low"])).to_numpy()
+    matr = multiplier * plan.atr(length).to_numpy()
+    upperband = hl2 + matr
+    lowerband = hl2 - matr
+    m = close.size
+    direction = np.ones(m)
+    trend = np.full(m, np.nan)
+    long = np.full(m, np.nan)
+    short = np.full(m, np.nan)
+    for i in range(1, m):
+        if close[i] > upperband[i - 1]:
+            direction[i] = 1
+        elif close[i] < lowerband[i - 1]:
+            direction[i] = -1
+        else:
+            direction[i] = direction[i - 1]
+            if direction[i] > 0 and lowerband[i] < lowerband[i - 1]:
+                lowerband[i] = lowerband[i - 1]
+            if direction[i] < 0 and upperband[i] > upperband[i - 1]:
+                upperband[i] = upperband[i - 1]
+        if direction[i] > 0:
+            trend[i] = long[i] = lowerband[i]
+        else:
+            trend[i] = short[i] = upperband[i]
+    props = f"_{length}_{multiplier}"
+    index = plan.df.index
+    return {
+        f"SUPERT{props}": pd.Series(trend, index=index),
+        f"SUPERTd{props}": pd.Series(direction, index=index),
+        f"SUPERTl{props}": pd.Series(long, index=index),
+        f"SUPERTs{props}": pd.Series(short, index=index),
+    }
+
+@register_indicator("FIB", lambda p: p.get("window", 30))
+def _fib(plan, window=30):
+    # 행마다 직전 window개 캔들의 고점/저점으로 되돌림 수준을 계산 (rolling max/min은 O(n))
+    recent_high = plan.highest(window).to_numpy()
+    recent_low = plan.lowest(window).to_numpy()
+    price_range = recent_high - recent_low
+    close = plan.df["close"]
+    # 윈도우 마지막 종가가 첫 종가보다 높으면 상승 구간
+    rising = (close > close.shift(window - 1)).to_numpy()
+    return {
+        f"FIB_{ratio}": pd.Series(
+            np.where(rising, recent_high - price_range * ratio, recent_low + price_range * ratio),
+            index=plan.df.index,
+        )
+        for ratio in FIB_RATIOS
+    }
+
+
+def spec_key(spec):
+    name, params = spec
+    return (name, tuple(sorted(params.items())))
+
+def required_candles(specs):
+    # 요청된 지표를 모두 계산하는 데 필요한 최소 캔들 수
+    return max((INDICATORS[name][1](params) for name, params in specs), default=0)
+
+def compute_indicators(df, specs=None):
+    """
+    스펙 목록에 있는 지표만 계산해 df에 컬럼으로 추가한 새 DataFrame을 반환합니다.
+    이미 같은 프레임에서 계산된 스펙(df.attrs["indicator_specs"])은 건너뜁니다.
+    """
+    specs = DEFAULT_INDICATOR_SPECS if specs is None else specs
+    for name, _ in specs:
+        if name not in INDICATORS:
+            raise ValueError(f"알 수 없는 지표입니다: {name}")
+    done = set(df.attrs.get("indicator_specs", ()))
+    plan = IndicatorPlanner(df)
+    columns = {}
+    for spec in specs:
+        key = spec_key(spec)
+        if key in done:
+            continue
+        done.add(key)
+        name, params = spec
+        columns.update(INDICATORS[name][0](plan, **params))
+    if not columns:
+        return df
+    new_cols = pd.DataFrame(columns, index=df.index)
+    result = pd.concat([df.drop(columns=[c for c in new_cols.columns if c in df.columns]), new_cols], axis=1)
+    result.attrs["indicator_specs"] = sorted(done)
+    return result
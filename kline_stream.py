@@ -0,0 +1,214 @@
+import os
+import json
+import time
+import asyncio
+import numpy as np
+import pandas as pd
+import websockets
+from dotenv import load_dotenv
+from common import fetch_klines_range, interval_to_milliseconds
+
+# 환경 변수 로드
+load_dotenv()
+
+# Binance 웹소켓 주소 (테스트 시 로컬 대체 서버 주소로 변경 가능)
+BINANCE_WS_URL = os.getenv('BINANCE_WS_URL', "wss://stream.binance.com:9443")
+MAX_STREAMS_PER_CONNECTION = 1024 # Binance 연결당 최대 스트림 수
+RECONNECT_DELAY_SECONDS = 5
+
+KLINE_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+
+
+class KlineRingBuffer:
+    """
+    심볼별 마감 캔들 최근 capacity개를 고정 크기 배열에 보관하는 링 버퍼.
+    각 캔들을 i와 i + capacity 두 위치에 기록하므로, 최근 캔들 구간이 항상 연속된 메모리여서
+    values()/frame()은 복사 없는 뷰를 반환합니다. 다른 스레드로 넘길 때는 snapshot()으로 최대 capacity개를
+    한 번 복사합니다. 메모리 사용량은 capacity에만 비례합니다.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._values = np.full((2 * capacity, len(KLINE_COLUMNS)), np.nan)
+        self._open_time = np.zeros(2 * capacity, dtype='datetime64[ms]')
+        self._count = 0 # 지금까지 추가된 캔들 수
+
+    def __len__(self):
+        return min(self._count, self.capacity)
+
+    @property
+    def last_open_time_ms(self):
+        if not self._count:
+            return None
+        return int(self._open_time[(self._count - 1) % self.capacity].astype('int64'))
+
+    # 마감된 캔들 추가. 같은 open_time이면 마지막 캔들을 덮어쓰고, 더 오래된 캔들은 무시
+    def append(self, open_time_ms, open_, high, low, close, volume):
+        last_open_time_ms = self.last_open_time_ms
+        if last_open_time_ms is not None and open_time_ms < last_open_time_ms:
+            return False
+        if last_open_time_ms is not None and open_time_ms == last_open_time_ms:
+            pos = (self._count - 1) % self.capacity
+        else:
+            pos = self._count % self.capacity
+            self._count += 1
+        row = (open_, high, low, close, volume)
+        self._values[pos] = row
+        self._values[pos + self.capacity] = row
+        self._open_time[pos] = open_time_ms
+        self._open_time[pos + self.capacity] = open_time_ms
+        return True
+
+    # fetch_historical_klines 형식의 DataFrame(open_time 인덱스)을 버퍼에 채움
+    def extend_from_frame(self, df):
+        for open_time, row in zip(df.index, df[KLINE_COLUMNS].itertuples(index=False)):
+            self.append(int(open_time.value // 1_000_000), *row)
+
+    def _window(self):
+        if self._count <= self.capacity:
+            return 0, self._count
+        start = self._count % self.capacity
+        return start, start + self.capacity
+
+    # 오래된 것부터 최근 순으로 정렬된 (N, 5) 배열 뷰 (복사 없음)
+    def values(self):
+        start, end = self._window()
+        return self._values[start:end]
+
+    # 같은 스레드에서 바로 사용할 DataFrame 뷰 (복사 없음)
+    # 다음 append에서 내용이 바뀔 수 있으므로, 뷰는 다음 이벤트 처리 전에 사용을 마쳐야 합니다.
+    def frame(self):
+        start, end = self._window()
+        index = pd.DatetimeIndex(self._open_time[start:end], name='open_time')
+        return pd.DataFrame(self._values[start:end], index=index, columns=KLINE_COLUMNS, copy=False)
+
+    # 다른 스레드에서 사용할 수 있도록 현재 구간을 복사한 DataFrame (크기는 capacity로 고정)
+    def snapshot(self):
+        return self.frame().copy()
+
+
+def kline_stream_url(symbols, interval, base_url=None):
+    streams = "/".join(f"{symbol.lower()}@kline_{interval}" for symbol in symbols)
+    return f"{base_url or BINANCE_WS_URL}/stream?streams={streams}"
+
+# 웹소켓 메시지에서 kline 이벤트를 꺼내는 함수 (combined stream / 단일 stream 형식 모두 지원)
+def parse_kline_event(message):
+    try:
+        event = json.loads(message)
+    except (json.JSONDecodeError, TypeError):
+        return None
+    if isinstance(event, dict) and "data" in event:
+        event = event["data"]
+    if not isinstance(event, dict) or event.get("e") != "kline" or "k" not in event:
+        return None
+    return event["k"]
+
+
+class KlineStream:
+    """
+    Binance kline 웹소켓 이벤트를 받아 심볼별 KlineRingBuffer에 마감 캔들을 쌓습니다.
+    캔들이 마감될 때마다 on_closed_candle(symbol, frame, kline)을 워커 스레드에서 호출합니다.
+    frame은 해당 캔들까지의 버퍼 스냅샷(이벤트마다 최대 capacity개를 복사한 DataFrame)이며,
+    같은 심볼의 콜백은 캔들 순서대로 하나씩 실행됩니다.
+    """
+
+    def __init__(self, symbols, interval, capacity, on_closed_candle=None, base_url=None, reconnect_delay=RECONNECT_DELAY_SECONDS):
+        self.symbols = [symbol.upper() for symbol in symbols]
+        self.interval = interval
+        self.buffers = {symbol: KlineRingBuffer(capacity) for symbol in self.symbols}
+        self.on_closed_candle = on_closed_candle
+        self.base_url = base_url
+        self.reconnect_delay = reconnect_delay
+        self._symbol_locks = {}
+        self._pending = set()
+
+    # REST로 버퍼의 빈 구간을 채우고, 콜백으로 넘길 마감 캔들 이벤트 목록을 반환
+    # 시작 시(빈 버퍼)에는 마지막 캔들만, 재연결 후에는 누락 구간의 모든 캔들을 반환합니다.
+    def fill_gaps(self, binance_client, symbols=None, end_time_ms=None):
+        interval_ms = interval_to_milliseconds(self.interval)
+        end_time_ms = end_time_ms or int(time.time() * 1000)
+        events = []
+        for symbol in symbols or self.symbols:
+            buffer = self.buffers[symbol]
+            initial_fill = len(buffer) == 0
+            last_open_time_ms = buffer.last_open_time_ms
+            start_ms = last_open_time_ms + 1 if last_open_time_ms is not None else end_time_ms - buffer.capacity * interval_ms
+            df = fetch_klines_range(binance_client, symbol, self.interval, start_ms, end_time_ms)
+            if df.empty:
+                continue
+            # 아직 마감되지 않은 캔들은 제외
+            closed = df[df['close_time'] < pd.Timestamp(end_time_ms, unit='ms')]
+            for i, (open_time, row) in enumerate(closed.iterrows()):
+                appended = buffer.append(int(open_time.value // 1_000_000), *(row[col] for col in KLINE_COLUMNS))
+                if appended and (not initial_fill or i == len(closed) - 1):
+                    kline = {"s": symbol, "t": int(open_time.value // 1_000_000), "T": int(row['close_time'].value // 1_000_000), "x": True}
+                    events.append((symbol, buffer.snapshot(), kline))
+        return events
+
+    # 마감 캔들을 버퍼에 추가하고, 콜백으로 넘길 (symbol, 스냅샷, kline) 이벤트를 반환
+    def handle_message(self, message):
+        kline = parse_kline_event(message)
+        if kline is None or not kline.get("x"):
+            return None # 마감되지 않은 캔들 업데이트는 무시
+        buffer = self.buffers.get(kline.get("s"))
+        if buffer is None:
+            return None
+        try:
+            appended = buffer.append(
+                int(kline["t"]),
+                float(kline["o"]), float(kline["h"]), float(kline["l"]), float(kline["c"]), float(kline["v"])
+            )
+        except (KeyError, TypeError, ValueError) as e:
+            print(f"{kline.get('s')} kline 이벤트 형식 오류: {e}")
+            return None
+        if not appended:
+            return None
+        # 콜백은 워커 스레드에서 실행되고 링 버퍼 뷰는 다음 append에서 바뀌므로, 최대 capacity개를 복사한 스냅샷을 넘김
+        return kline["s"], buffer.snapshot(), kline
+
+    # 콜백을 이벤트 루프 밖(워커 스레드)에서 실행. 같은 심볼은 순서대로, 오류는 로그만 남김
+    async def _dispatch(self, symbol, frame, kline):
+        lock = self._symbol_locks.setdefault(symbol, asyncio.Lock())
+        async with lock:
+            try:
+                await asyncio.to_thread(self.on_closed_candle, symbol, frame, kline)
+            except Exception as e:
+                print(f"{symbol} 마감 캔들 처리 중 오류 발생: {e}")
+
+    def _schedule(self, event):
+        if event is None or self.on_closed_candle is None:
+            return
+        task = asyncio.create_task(self._dispatch(*event))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _consume(self, symbols, stop_event, binance_client):
+        url = kline_stream_url(symbols, self.interval, self.base_url)
+        while not stop_event.is_set():
+            try:
+                async with websockets.connect(url) as ws:
+                    print(f"kline 웹소켓 연결: {len(symbols)}개 심볼")
+                    if binance_client is not None:
+                        for event in await asyncio.to_thread(self.fill_gaps, binance_client, symbols):
+                            self._schedule(event)
+                    async for message in ws:
+                        self._schedule(self.handle_message(message))
+                        if stop_event.is_set():
+                            break
+            except (OSError, websockets.exceptions.WebSocketException) as e:
+                print(f"kline 웹소켓 연결 오류: {e}. {self.reconnect_delay}초 후 재연결합니다.")
+            if not stop_event.is_set():
+                await asyncio.sleep(self.reconnect_delay)
+
+    # 연결당 MAX_STREAMS_PER_CONNECTION개씩 나눠 스트림을 소비 (연결이 끊기면 자동 재연결)
+    # binance_client를 넘기면 연결할 때마다 REST로 누락된 캔들을 보충합니다.
+    async def run(self, stop_event=None, binance_client=None):
+        stop_event = stop_event or asyncio.Event()
+        chunks = [self.symbols[i:i + MAX_STREAMS_PER_CONNECTION] for i in range(0, len(self.symbols), MAX_STREAMS_PER_CONNECTION)]
+        try:
+            await asyncio.gather(*(self._consume(chunk, stop_event, binance_client) for chunk in chunks))
+        finally:
+            # 종료 시 이미 받은 마감 캔들의 처리를 마무리
+            if self._pending:
+                await asyncio.gather(*self._pending, return_exceptions=True)
+
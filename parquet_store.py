@@ -0,0 +1,109 @@
+import os
+import glob
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from dotenv import load_dotenv
+
+# 환경 변수 로드
+load_dotenv()
+
+# 지표 히스토리 Parquet 저장 경로. 파티션 구조: <root>/symbol=<심볼>/interval=<인터벌>/year=<연도>/
+PARQUET_ROOT = os.getenv('PARQUET_ROOT', "data/indicators")
+COMPACT_THRESHOLD = 32 # 파티션의 일별 파일 수가 이 값을 넘으면 하나의 파일로 합침
+COMPACTED_FILE_NAME = "data.parquet"
+TIME_COLUMNS = ['open_time', 'close_time']
+
+
+def partition_dir(symbol, interval, year, root=None):
+    return os.path.join(root or PARQUET_ROOT, f"symbol={symbol}", f"interval={interval}", f"year={year}")
+
+# 같은 open_time은 나중에 기록된 값을 남기고 open_time 순으로 정렬
+def _dedupe(df):
+    return df[~df['open_time'].duplicated(keep='last')].sort_values('open_time', kind='stable')
+
+# 시간 컬럼 단위를 ns로 통일 (REST 프레임은 ns, 링 버퍼 프레임은 ms라 파일 간 스키마가 어긋나지 않도록)
+def _normalize_times(df):
+    return df.assign(**{col: df[col].astype('datetime64[ns]') for col in TIME_COLUMNS if col in df.columns})
+
+# 임시 파일에 쓴 뒤 교체해, 읽는 쪽이 쓰다 만 파일을 보지 않도록 함
+def _write_atomic(df, path):
+    tmp_path = path + ".tmp"
+    pq.write_table(pa.Table.from_pandas(_normalize_times(df), preserve_index=False), tmp_path)
+    os.replace(tmp_path, path)
+
+# calculate_all_indicators 결과 프레임(open_time 인덱스)을 symbol/interval/year 파티션에 추가
+# 날짜별 파일(part-YYYY-MM-DD.parquet)에 병합해 같은 날짜를 다시 내보내도 중복되지 않습니다.
+def export_indicator_frame(df, symbol, interval, root=None):
+    if df.empty:
+        return []
+    frame = _normalize_times(df.reset_index().rename(columns={df.index.name or 'index': 'open_time'}))
+    written = []
+    for day, day_df in frame.groupby(frame['open_time'].dt.strftime('%Y-%m-%d')):
+        directory = partition_dir(symbol, interval, day[:4], root)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"part-{day}.parquet")
+        if os.path.exists(path):
+            day_df = pd.concat([_normalize_times(pq.read_table(path).to_pandas()), day_df], ignore_index=True)
+        _write_atomic(_dedupe(day_df), path)
+        written.append(path)
+    for directory in {os.path.dirname(path) for path in written}:
+        if len(glob.glob(os.path.join(directory, "part-*.parquet"))) > COMPACT_THRESHOLD:
+            compact_partition(directory)
+    print(f"{symbol} {interval} 지표 히스토리 {len(frame)}행 Parquet 내보내기 완료.")
+    return written
+
+# 파티션의 일별 파일을 하나의 data.parquet으로 합침 (읽기 시 파일 수를 줄이기 위함)
+def compact_partition(directory):
+    paths = _partition_files(directory)
+    if len(paths) <= 1:
+        return
+    tables = [pq.read_table(path, memory_map=True) for path in paths]
+    # permissive: 수정 전에 ms 단위로 기록된 파일도 ns로 승격해 병합
+    merged = pa.concat_tables(tables, promote_options="permissive").to_pandas()
+    _write_atomic(_dedupe(merged), os.path.join(directory, COMPACTED_FILE_NAME))
+    for path in paths:
+        if os.path.basename(path) != COMPACTED_FILE_NAME:
+            os.remove(path)
+
+# 오래된 데이터부터 읽도록 정렬 (data.parquet 다음에 일별 파일을 날짜순으로)
+def _partition_files(directory):
+    compacted = os.path.join(directory, COMPACTED_FILE_NAME)
+    parts = sorted(glob.glob(os.path.join(directory, "part-*.parquet")))
+    return ([compacted] if os.path.exists(compacted) else []) + parts
+
+# "year=2023" 형태의 파티션 디렉터리 이름에서 값 추출
+def _partition_value(directory):
+    return os.path.basename(directory).split("=", 1)[1]
+
+# Parquet 지표 히스토리를 메모리 매핑으로 읽어 (symbol, open_time) 인덱스 DataFrame으로 반환
+# 디렉터리 이름(symbol/interval/year)으로 필요한 파티션만 골라 읽으며, Mongo에는 접근하지 않습니다.
+def load_indicator_history(symbols=None, interval="1d", start=None, end=None, columns=None, root=None):
+    start = pd.Timestamp(start) if start is not None else None
+    end = pd.Timestamp(end) if end is not None else None
+    read_columns = None if columns is None else ['open_time'] + [col for col in columns if col != 'open_time']
+    tables = []
+    for symbol_dir in sorted(glob.glob(os.path.join(root or PARQUET_ROOT, "symbol=*"))):
+        symbol = _partition_value(symbol_dir)
+        if symbols is not None and symbol not in symbols:
+            continue
+        for year_dir in sorted(glob.glob(os.path.join(symbol_dir, f"interval={interval}", "year=*"))):
+            year = int(_partition_value(year_dir))
+            if (start is not None and year < start.year) or (end is not None and year > end.year):
+                continue
+            for path in _partition_files(year_dir):
+                # 지표 스펙이 바뀌어 일부 파일에 없는 컬럼은 건너뜀 (concat 시 null로 채워짐)
+                file_columns = None if read_columns is None else [col for col in read_columns if col in pq.read_schema(path, memory_map=True).names]
+                table = pq.read_table(path, columns=file_columns, memory_map=True)
+                tables.append(table.append_column("symbol", pa.array([symbol] * table.num_rows, pa.string())))
+    if not tables:
+        return pd.DataFrame()
+    # split_blocks=True로 컬럼별 블록을 유지해 가능한 경우 복사 없이 변환
+    # permissive: 없는 컬럼은 null로 채우고, 수정 전에 ms 단위로 기록된 시간 컬럼도 ns로 승격
+    df = pa.concat_tables(tables, promote_options="permissive").to_pandas(split_blocks=True)
+    if start is not None:
+        df = df[df['open_time'] >= start]
+    if end is not None:
+        df = df[df['open_time'] <= end]
+    df = df[~df.duplicated(subset=['symbol', 'open_time'], keep='last')]
+    return df.set_index(['symbol', 'open_time']).sort_index()
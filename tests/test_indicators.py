@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+ta = pytest.importorskip("pandas_ta")
+
+from indicators import DEFAULT_INDICATOR_SPECS, PANDAS_TA_VERSION, compute_indicators
+
+pytestmark = pytest.mark.skipif(
+    getattr(ta, "version", None) != PANDAS_TA_VERSION,
+    reason=f"지표 계산식은 pandas_ta {PANDAS_TA_VERSION} 기준입니다.",
+)
+
+
+# 250개 일봉 랜덤 워크 (open_time 인덱스, fetch_klines_range 결과와 같은 컬럼)
+def make_candles(n=250, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1, n))
+    high = close + rng.uniform(0, 2, n)
+    low = close - rng.uniform(0, 2, n)
+    index = pd.date_range("2023-01-01", periods=n, freq="D", name="open_time")
+    return pd.DataFrame({
+        "close_time": index + pd.Timedelta(days=1) - pd.Timedelta(milliseconds=1),
+        "open": close + rng.normal(0, 0.5, n),
+        "high": high,
+        "low": low,
+        "close": close,
+        "volume": rng.uniform(100, 1000, n),
+    }, index=index)
+
+# indicators.py 도입 전 calculate_all_indicators의 df.ta.* 호출 (피보나치 제외)
+def legacy_indicators(df):
+    df = df.copy()
+    for p in [5, 10, 20, 50, 60, 100, 200]:
+        df.ta.sma(close=df["close"], length=p, append=True)
+        df.ta.ema(close=df["close"], length=p, append=True)
+    for fast, slow, sig in [(12, 26, 9), (24, 52, 18), (19, 39, 9)]:
+        df.ta.macd(close=df["close"], fast=fast, slow=slow, signal=sig, append=True)
+    for L in [7, 14, 21]:
+        df.ta.rsi(close=df["close"], length=L, append=True)
+    for k, d in [(5, 3), (9, 3), (14, 3)]:
+        df.ta.stoch(high=df["high"], low=df["low"], close=df["close"], k=k, d=d, append=True)
+    for L in [10, 20, 50]:
+        df.ta.bbands(close=df["close"], length=L, std=2, append=True)
+    for L in [7, 14, 28]:
+        df.ta.atr(high=df["high"], low=df["low"], close=df["close"], length=L, append=True)
+    df.ta.obv(close=df["close"], volume=df["volume"], append=True)
+    for L in [10, 20, 50]:
+        df.ta.sma(close=df["OBV"], length=L, append=True, prefix="OBV_")
+    df.ta.ichimoku(high=df["high"], low=df["low"], close=df["close"], tenkan=9, kijun=26, senkou_b=52, append=True)
+    for L in [10, 14, 21]:
+        df.ta.supertrend(high=df["high"], low=df["low"], close=df["close"], length=L, multiplier=3, append=True)
+    return df
+
+
+def test_default_specs_match_legacy_pandas_ta_columns():
+    df = make_candles()
+    expected = legacy_indicators(df)
+    result = compute_indicators(df, DEFAULT_INDICATOR_SPECS)
+
+    missing = [col for col in expected.columns if col not in result.columns]
+    assert missing == []
+    # SUPERT 첫 행은 계산 전이므로 NaN으로 둠 (ATR이 준비되기 전 행과 동일하게 처리)
+    for col in expected.columns:
+        pd.testing.assert_series_equal(result[col].iloc[1:], expected[col].iloc[1:], check_dtype=False, check_names=False, obj=col)
+
+def test_supertrend_starts_with_nan():
+    result = compute_indicators(make_candles(), [("SUPERTREND", {"length": 10, "multiplier": 3})])
+    assert np.isnan(result["SUPERT_10_3.0"].iloc[0])
@@ -0,0 +1,158 @@
+import json
+import time
+import asyncio
+import numpy as np
+import pytest
+
+websockets = pytest.importorskip("websockets")
+
+from kline_stream import KlineRingBuffer, KlineStream, parse_kline_event
+
+INTERVAL_MS = 60_000
+RECONNECT_DELAY = 0.1
+
+
+def kline_event(symbol, open_time_ms, closed=True):
+    i = open_time_ms // INTERVAL_MS % 1000
+    return {
+        "e": "kline", "s": symbol,
+        "k": {
+            "t": open_time_ms, "T": open_time_ms + INTERVAL_MS - 1, "s": symbol, "i": "1m",
+            "o": str(100 + i), "h": str(101 + i), "l": str(99 + i), "c": str(100.5 + i), "v": "10", "x": closed
+        }
+    }
+
+def combined_message(symbol, open_time_ms, closed=True):
+    return json.dumps({"stream": f"{symbol.lower()}@kline_1m", "data": kline_event(symbol, open_time_ms, closed)})
+
+# get_klines만 흉내 내는 REST 클라이언트. available개의 캔들(open_times 앞에서부터)만 조회됩니다.
+class FakeBinanceClient:
+    def __init__(self, open_times, available):
+        self.open_times = open_times
+        self.available = available
+        self.calls = []
+
+    def get_klines(self, symbol, interval, startTime, endTime, limit):
+        self.calls.append((startTime, endTime))
+        return [
+            [t, "1", "2", "0.5", str(t // INTERVAL_MS % 1000 + 100.5), "10", t + INTERVAL_MS - 1, "0", 0, "0", "0", "0"]
+            for t in self.open_times[:self.available] if startTime <= t <= endTime
+        ][:limit]
+
+# 콜백에서 받은 (symbol, open_time, frame 길이)를 기록하고, 원하는 개수가 될 때까지 기다릴 수 있게 함
+class Recorder:
+    def __init__(self):
+        self.received = []
+
+    def __call__(self, symbol, frame, kline):
+        self.received.append((symbol, int(kline["t"]), len(frame)))
+
+    async def wait_for(self, count, timeout=10):
+        async def poll():
+            while len(self.received) < count:
+                await asyncio.sleep(0.01)
+        await asyncio.wait_for(poll(), timeout)
+
+async def run_against_server(handler, stream, recorder, count, binance_client=None):
+    async with websockets.serve(handler, "127.0.0.1", 0) as server:
+        stream.base_url = f"ws://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+        stop_event = asyncio.Event()
+        task = asyncio.create_task(stream.run(stop_event, binance_client))
+        try:
+            await recorder.wait_for(count)
+        finally:
+            stop_event.set()
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+
+def test_ring_buffer_wraparound():
+    buffer = KlineRingBuffer(3)
+    for i in range(5):
+        assert buffer.append(i * INTERVAL_MS, 100 + i, 101 + i, 99 + i, 100.5 + i, 10)
+    assert len(buffer) == 3
+    assert buffer.values()[:, 3].tolist() == [102.5, 103.5, 104.5] # 가장 오래된 것부터 최근 순
+    assert np.shares_memory(buffer.values(), buffer._values) # 복사 없는 뷰
+    frame = buffer.frame()
+    assert frame.index.is_monotonic_increasing
+    assert buffer.last_open_time_ms == 4 * INTERVAL_MS
+
+def test_ring_buffer_overwrites_same_open_time_and_ignores_older():
+    buffer = KlineRingBuffer(3)
+    for i in range(5):
+        buffer.append(i * INTERVAL_MS, 100 + i, 101 + i, 99 + i, 100.5 + i, 10)
+    assert buffer.append(4 * INTERVAL_MS, 0, 0, 0, 999.0, 0)
+    assert buffer.values()[-1, 3] == 999.0
+    assert not buffer.append(0, 0, 0, 0, 0, 0)
+    assert len(buffer) == 3
+
+def test_snapshot_is_not_changed_by_later_appends():
+    buffer = KlineRingBuffer(3)
+    for i in range(3):
+        buffer.append(i * INTERVAL_MS, 100 + i, 101 + i, 99 + i, 100.5 + i, 10)
+    snapshot = buffer.snapshot()
+    buffer.append(3 * INTERVAL_MS, 0, 0, 0, 1.0, 0)
+    assert snapshot['close'].tolist() == [100.5, 101.5, 102.5]
+    assert buffer.values()[:, 3].tolist() == [101.5, 102.5, 1.0]
+
+def test_parse_kline_event():
+    event = kline_event("BTCUSDT", INTERVAL_MS)
+    assert parse_kline_event(json.dumps({"stream": "btcusdt@kline_1m", "data": event}))["t"] == INTERVAL_MS
+    assert parse_kline_event(json.dumps(event))["s"] == "BTCUSDT"
+    assert parse_kline_event("not json") is None
+    assert parse_kline_event(json.dumps({"e": "trade"})) is None
+
+def test_stream_reconnects_to_local_server():
+    connections = []
+
+    # 첫 연결은 캔들 0~2를 보내고 끊어 재연결을 유도, 두 번째 연결은 캔들 3~5를 보냄
+    async def handler(ws, *_):
+        connections.append(ws)
+        first = len(connections) == 1
+        for i in (range(0, 3) if first else range(3, 6)):
+            await ws.send(combined_message("BTCUSDT", i * INTERVAL_MS))
+        await ws.send(combined_message("BTCUSDT", 99 * INTERVAL_MS, closed=False)) # 미마감 캔들은 무시
+        await ws.send("not json")
+        if not first:
+            await ws.wait_closed()
+
+    recorder = Recorder()
+    stream = KlineStream(["BTCUSDT"], "1m", 4, on_closed_candle=recorder, reconnect_delay=RECONNECT_DELAY)
+    asyncio.run(run_against_server(handler, stream, recorder, 6))
+
+    assert len(connections) >= 2 # 재연결 발생
+    assert [t for _, t, _ in recorder.received] == [i * INTERVAL_MS for i in range(6)] # 순서대로 한 번씩 처리
+    assert [n for _, _, n in recorder.received] == [1, 2, 3, 4, 4, 4] # capacity 이후 고정 크기 유지
+    assert stream.buffers["BTCUSDT"].values()[:, 3].tolist() == [102.5, 103.5, 104.5, 105.5]
+
+def test_stream_fills_gaps_from_rest_on_start_and_reconnect():
+    # 지금 기준 8분 전부터의 1분봉 open_time (모두 마감된 캔들)
+    now_floor_ms = int(time.time() * 1000) // INTERVAL_MS * INTERVAL_MS
+    open_times = [now_floor_ms - (8 - i) * INTERVAL_MS for i in range(8)]
+    rest = FakeBinanceClient(open_times, available=3)
+    recorder = Recorder()
+    connections = []
+
+    # 첫 연결: 시작 시 REST 보충(캔들 0~2)이 끝난 뒤 실시간 캔들 3을 보내고 끊음.
+    # 끊긴 동안 캔들 4~5가 마감되어 REST에서만 조회되고, 재연결 후에는 실시간 캔들 6을 보냄
+    async def handler(ws, *_):
+        connections.append(ws)
+        if len(connections) == 1:
+            await recorder.wait_for(1)
+            await ws.send(combined_message("BTCUSDT", open_times[3]))
+            await recorder.wait_for(2)
+            rest.available = 6
+        else:
+            await recorder.wait_for(4)
+            await ws.send(combined_message("BTCUSDT", open_times[6]))
+            await ws.wait_closed()
+
+    stream = KlineStream(["BTCUSDT"], "1m", 10, on_closed_candle=recorder, reconnect_delay=RECONNECT_DELAY)
+    asyncio.run(run_against_server(handler, stream, recorder, 5, binance_client=rest))
+
+    assert len(connections) >= 2
+    # 시작 시에는 보충한 캔들 중 마지막 캔들만, 재연결 후에는 놓친 캔들을 모두 콜백으로 전달
+    assert [t for _, t, _ in recorder.received] == open_times[2:7]
+    assert [n for _, _, n in recorder.received] == [3, 4, 5, 6, 7]
+    # 재연결 시에는 버퍼의 마지막 캔들 다음부터 조회
+    assert any(start == open_times[3] + 1 for start, _ in rest.calls)